@@ -8,22 +8,45 @@
 #
 
 
+import contextlib
+import functools
 import ipaddress
 import sys
+import threading
 from builtins import object
-from collections import defaultdict
-from typing import Any, Callable, Dict, List, Tuple
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
 
 import click
 from openr.cli.utils import utils
 from openr.cli.utils.commands import OpenrCtrlCmd
+from openr.clients.openr_client import get_openr_ctrl_client
+from openr.Fib import ttypes as fib_types
 from openr.KvStore import ttypes as kv_store_types
 from openr.Lsdb import ttypes as lsdb_types
 from openr.Network import ttypes as network_types
 from openr.OpenrCtrl import OpenrCtrl
 from openr.utils import ipnetwork, printing
 from openr.utils.consts import Consts
-from openr.utils.serializer import deserialize_thrift_object
+from openr.utils.serializer import (
+    deserialize_thrift_object,
+    deserialize_thrift_objects,
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _sprint_addr(addr: bytes) -> str:
+    """ cached ipnetwork.sprint_addr, keyed on the binary address """
+
+    return ipnetwork.sprint_addr(addr)
+
+
+@functools.lru_cache(maxsize=4096)
+def _sprint_prefix(addr: bytes, prefix_len: int) -> str:
+    """ cached ipnetwork.sprint_prefix, keyed on the binary address and length """
+
+    return "{}/{}".format(_sprint_addr(addr), prefix_len)
 
 
 class DecisionCmdBase(OpenrCtrlCmd):
@@ -37,6 +60,7 @@ class DecisionCmdBase(OpenrCtrlCmd):
         dbs: Dict,
         nodes: set,
         parse_func: Callable[[Any, Dict], None],
+        sort: bool = True,
     ):
         """
         parse prefix databases from decision module
@@ -45,9 +69,13 @@ class DecisionCmdBase(OpenrCtrlCmd):
         @param: dbs - decision_types.PrefixDbs or decision_types.AdjDbs
         @param: nodes - set: the set of nodes for parsing
         @param: parse_func - function: the parsing function
+        @param: sort - bool: parse dbs in node name order
         """
-        for (node, db) in sorted(dbs.items()):
-            if "all" not in nodes and node not in nodes:
+        wants_all = "all" in nodes
+        if not wants_all and not isinstance(nodes, (set, frozenset)):
+            nodes = frozenset(nodes)
+        for (node, db) in sorted(dbs.items()) if sort else dbs.items():
+            if not wants_all and node not in nodes:
                 continue
             parse_func(container, db)
 
@@ -72,17 +100,60 @@ class DecisionRoutesComputedCmd(DecisionCmdBase):
     ) -> None:
         if "all" in nodes:
             nodes = self._get_all_nodes(client)
+        # json output is keyed by sorted node names, stream it in that order
+        nodes = sorted(nodes)
+        route_dbs = self._get_route_dbs(client, nodes)
         if json:
-            route_db_dict = {}
-            for node in nodes:
-                route_db = client.getRouteDbComputed(node)
-                route_db_dict[node] = utils.route_db_to_dict(route_db)
-            utils.print_routes_json(route_db_dict, prefixes, labels)
+            utils.print_routes_json_iter(
+                (
+                    (node, utils.route_db_to_dict(route_db))
+                    for node, route_db in zip(nodes, route_dbs)
+                ),
+                prefixes,
+                labels,
+            )
         else:
-            for node in nodes:
-                route_db = client.getRouteDbComputed(node)
+            for route_db in route_dbs:
                 utils.print_route_db(route_db, prefixes, labels)
 
+    def _get_route_dbs(
+        self, client: OpenrCtrl.Client, nodes: List[str]
+    ) -> Iterator[fib_types.RouteDatabase]:
+        """
+        fetch computed route dbs of nodes concurrently, yielded lazily in the
+        order of nodes. thrift clients are not thread safe, so every worker thread opens
+        its own on first use and all of them are closed once the pool is done.
+        """
+
+        if len(nodes) <= 1:
+            yield from (client.getRouteDbComputed(node) for node in nodes)
+            return
+
+        worker = threading.local()
+        worker_clients_lock = threading.Lock()
+
+        with contextlib.ExitStack() as worker_clients:
+
+            def _get_route_db(node):
+                if getattr(worker, "client", None) is None:
+                    worker_client = get_openr_ctrl_client(self.host, self.cli_opts)
+                    with worker_clients_lock:
+                        worker_clients.push(worker_client)
+                    worker.client = worker_client.__enter__()
+                return worker.client.getRouteDbComputed(node)
+
+            # only keep max_workers requests in flight, so route dbs not yet
+            # consumed by the caller don't pile up in finished futures
+            max_workers = min(len(nodes), Consts.CTRL_MAX_CONCURRENT_REQUESTS)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = deque()
+                for node in nodes:
+                    if len(futures) == max_workers:
+                        yield futures.popleft().result()
+                    futures.append(executor.submit(_get_route_db, node))
+                while futures:
+                    yield futures.popleft().result()
+
     def _get_all_nodes(self, client: OpenrCtrl.Client) -> set:
         """ return all the nodes' name in the network """
 
@@ -91,7 +162,7 @@ class DecisionRoutesComputedCmd(DecisionCmdBase):
 
         nodes = set()
         adj_dbs = client.getDecisionPrefixDbs()
-        self.iter_dbs(nodes, adj_dbs, ["all"], _parse)
+        self.iter_dbs(nodes, adj_dbs, {"all"}, _parse, sort=False)
         return nodes
 
 
@@ -116,11 +187,13 @@ class PathCmd(DecisionCmdBase):
 
         # Get prefix_dbs from KvStore
         self.prefix_dbs = {}
+        self._node_prefix_networks = {}
         pub = client.getKvStoreKeyValsFiltered(
             kv_store_types.KeyDumpParams(Consts.PREFIX_DB_MARKER)
         )
-        for v in pub.keyVals.values():
-            prefix_db = deserialize_thrift_object(v.value, lsdb_types.PrefixDatabase)
+        for prefix_db in deserialize_thrift_objects(
+            (v.value for v in pub.keyVals.values()), lsdb_types.PrefixDatabase
+        ):
             self.prefix_dbs[prefix_db.thisNodeName] = prefix_db
 
         paths = self.get_paths(client, src, dst, max_hop)
@@ -157,99 +230,159 @@ class PathCmd(DecisionCmdBase):
                     continue
 
         loopback_set = set()
-        self.iter_dbs(loopback_set, self.prefix_dbs, node, _parse)
+        self.iter_dbs(loopback_set, self.prefix_dbs, {node}, _parse, sort=False)
         return loopback_set.pop() if len(loopback_set) > 0 else None
 
     def get_node_prefixes(self, node, ipv4=False):
         def _parse(prefix_set, prefix_db):
             for prefix_entry in prefix_db.prefixEntries:
                 if len(prefix_entry.prefix.prefixAddress.addr) == (4 if ipv4 else 16):
-                    prefix_set.add(ipnetwork.sprint_prefix(prefix_entry.prefix))
+                    prefix_set.add(
+                        _sprint_prefix(
+                            prefix_entry.prefix.prefixAddress.addr,
+                            prefix_entry.prefix.prefixLength,
+                        )
+                    )
 
         prefix_set = set()
-        self.iter_dbs(prefix_set, self.prefix_dbs, node, _parse)
+        self.iter_dbs(prefix_set, self.prefix_dbs, {node}, _parse, sort=False)
         return prefix_set
 
+    def get_node_prefix_networks(self, node, ipv4=False) -> List[Tuple[int, int, int]]:
+        """
+        (network_int, netmask_int, prefix_len) of node's prefixes, built once
+        per node
+        """
+
+        key = (node, ipv4)
+        if key not in self._node_prefix_networks:
+            prefixes = map(ipaddress.ip_network, self.get_node_prefixes(node, ipv4))
+            self._node_prefix_networks[key] = [
+                (int(p.network_address), int(p.netmask), p.prefixlen) for p in prefixes
+            ]
+        return self._node_prefix_networks[key]
+
     def get_if2node_map(self, adj_dbs):
-        """ create a map from interface to node """
+        """
+        create a map from (node, interface, nexthop addr) to the neighbor node
+        """
 
         def _parse(if2node, adj_db):
-            nexthop_dict = if2node[adj_db.thisNodeName]
+            node = adj_db.thisNodeName
             for adj in adj_db.adjacencies:
-                nh6_addr = ipnetwork.sprint_addr(adj.nextHopV6.addr)
-                nh4_addr = ipnetwork.sprint_addr(adj.nextHopV4.addr)
-                nexthop_dict[(adj.ifName, nh6_addr)] = adj.otherNodeName
-                nexthop_dict[(adj.ifName, nh4_addr)] = adj.otherNodeName
+                nh6_addr = _sprint_addr(adj.nextHopV6.addr)
+                nh4_addr = _sprint_addr(adj.nextHopV4.addr)
+                if2node[(node, adj.ifName, nh6_addr)] = adj.otherNodeName
+                if2node[(node, adj.ifName, nh4_addr)] = adj.otherNodeName
 
-        if2node = defaultdict(dict)
-        self.iter_dbs(if2node, adj_dbs, ["all"], _parse)
+        if2node: Dict[Tuple[str, str, str], str] = {}
+        self.iter_dbs(if2node, adj_dbs, {"all"}, _parse, sort=False)
         return if2node
 
-    def get_lpm_route(self, route_db, dst_addr):
-        """ find the routes to the longest prefix matches of dst. """
+    def get_lpm_table(self, route_db):
+        """
+        index route_db's unicast routes by ip version and prefix length so
+        that longest prefix match only probes one network per prefix length.
+        networks are kept as integers and matched with a precomputed netmask.
+
+        duplicate prefixes are rejected here, once per route_db, so lookups
+        can return on the first match without re-validating the table.
+
+        @return: dict - ip version to [(netmask_int, {network_int: route})],
+                 sorted by prefix length from the longest to the shortest
+        """
 
-        max_prefix_len = -1
-        lpm_route = None
-        dst_addr = ipaddress.ip_address(dst_addr)
+        tables = defaultdict(dict)
         for route in route_db.unicastRoutes:
-            prefix = ipaddress.ip_network(ipnetwork.sprint_prefix(route.dest))
-            if dst_addr in prefix:
-                next_hop_prefix_len = route.dest.prefixLength
-                if next_hop_prefix_len == max_prefix_len:
-                    raise Exception(
-                        "Duplicate prefix found in routing table {}".format(
-                            ipnetwork.sprint_prefix(route.dest)
-                        )
+            addr = route.dest.prefixAddress.addr
+            version, max_len = (4, 32) if len(addr) == 4 else (6, 128)
+            prefix_len = route.dest.prefixLength
+            netmask = ((1 << prefix_len) - 1) << (max_len - prefix_len)
+            network = int.from_bytes(addr, "big") & netmask
+            routes = tables[(version, netmask)]
+            if network in routes:
+                raise Exception(
+                    "Duplicate prefix found in routing table {}".format(
+                        ipnetwork.sprint_prefix(route.dest)
                     )
-                elif next_hop_prefix_len > max_prefix_len:
-                    lpm_route = route
-                    max_prefix_len = next_hop_prefix_len
+                )
+            routes[network] = route
+
+        lpm_table = defaultdict(list)
+        for (version, netmask), routes in sorted(tables.items(), reverse=True):
+            lpm_table[version].append((netmask, routes))
+        return lpm_table
+
+    def get_lpm_route(self, lpm_table, dst_int, is_ipv4):
+        """
+        find the routes to the longest prefix matches of dst.
+
+        @param: dst_int - int: the destination address as an integer
+        @param: is_ipv4 - bool: whether dst is an ipv4 address
+        """
+
+        for netmask, routes in lpm_table.get(4 if is_ipv4 else 6, []):
+            route = routes.get(dst_int & netmask)
+            if route is not None:
+                return route
 
-        return lpm_route
+        return None
 
-    def get_lpm_len_from_node(self, node, dst_addr):
+    def get_lpm_len_from_node(self, node, dst_int, is_ipv4):
         """
-        return the longest prefix match of dst_addr in node's
+        return the longest prefix match of dst in node's
         advertising prefix pool
+
+        @param: dst_int - int: the destination address as an integer
+        @param: is_ipv4 - bool: whether dst is an ipv4 address
         """
 
         cur_lpm_len = 0
-        dst_addr = ipaddress.ip_address(dst_addr)
-        is_ipv4 = isinstance(dst_addr, ipaddress.IPv4Address)
-        for cur_prefix in self.get_node_prefixes(node, is_ipv4):
-            if dst_addr in ipaddress.ip_network(cur_prefix):
-                cur_len = int(cur_prefix.split("/")[1])
-                cur_lpm_len = max(cur_lpm_len, cur_len)
+        for network, netmask, prefix_len in self.get_node_prefix_networks(
+            node, is_ipv4
+        ):
+            if prefix_len > cur_lpm_len and dst_int & netmask == network:
+                cur_lpm_len = prefix_len
         return cur_lpm_len
 
     def get_nexthop_nodes(
-        self, route_db, dst_addr, cur_lpm_len, if2node, fib_routes, in_fib
+        self,
+        route_db,
+        lpm_table,
+        dst_int,
+        is_ipv4,
+        cur_lpm_len,
+        if2node,
+        fib_routes,
+        in_fib,
     ):
         """ get the next hop nodes.
         if the longest prefix is coming from the current node,
         return an empty list to terminate the path searching. """
 
         next_hop_nodes = []
-        is_initialized = fib_routes[route_db.thisNodeName]
 
-        lpm_route = self.get_lpm_route(route_db, dst_addr)
-        is_ipv4 = isinstance(ipaddress.ip_address(dst_addr), ipaddress.IPv4Address)
+        lpm_route = self.get_lpm_route(lpm_table, dst_int, is_ipv4)
         if lpm_route and lpm_route.dest.prefixLength >= cur_lpm_len:
-            if in_fib and not is_initialized:
-                fib_routes[route_db.thisNodeName].extend(
-                    self.get_fib_path(
+            if in_fib and route_db.thisNodeName not in fib_routes:
+                fib_routes[route_db.thisNodeName] = {
+                    (_sprint_addr(nexthop.addr), nexthop.ifName)
+                    for nexthop in self.get_fib_path(
                         route_db.thisNodeName,
-                        ipnetwork.sprint_prefix(lpm_route.dest),
+                        _sprint_prefix(
+                            lpm_route.dest.prefixAddress.addr,
+                            lpm_route.dest.prefixLength,
+                        ),
                         self.fib_agent_port,
                         self.timeout,
                     )
-                )
+                }
             min_cost = min(p.metric for p in lpm_route.nextHops)
             for nextHop in [p for p in lpm_route.nextHops if p.metric == min_cost]:
                 if len(nextHop.address.addr) == (4 if is_ipv4 else 16):
-                    nh_addr = ipnetwork.sprint_addr(nextHop.address.addr)
-                    next_hop_node_name = if2node[route_db.thisNodeName][
-                        (nextHop.address.ifName, nh_addr)
+                    nh_addr = _sprint_addr(nextHop.address.addr)
+                    next_hop_node_name = if2node[
+                        (route_db.thisNodeName, nextHop.address.ifName, nh_addr)
                     ]
                     next_hop_nodes.append(
                         [
@@ -272,7 +405,10 @@ class PathCmd(DecisionCmdBase):
         except Exception:
             return []
         for route in routes:
-            if ipnetwork.sprint_prefix(route.dest) == dst_prefix:
+            if (
+                _sprint_prefix(route.dest.prefixAddress.addr, route.dest.prefixLength)
+                == dst_prefix
+            ):
                 if route.nextHops and len(route.nextHops):
                     return [nh.address for nh in route.nextHops]
                 else:
@@ -283,8 +419,9 @@ class PathCmd(DecisionCmdBase):
         self, client: OpenrCtrl.Client, src: str, dst: str, max_hop: int
     ) -> Any:
         """
-        calc paths from src to dst using backtracking. can add memoization to
-        convert to dynamic programming for better scalability when network is large.
+        calc paths from src to dst using backtracking, walked with an explicit
+        stack rather than recursion. route dbs and lpm lengths are memoized per
+        node for the duration of the call.
         """
 
         dst_addr = dst
@@ -292,68 +429,103 @@ class PathCmd(DecisionCmdBase):
         if ":" not in dst:
             dst_addr = self.get_loopback_addr(dst)
         try:
-            ipaddress.ip_address(dst_addr)
+            dst_addr = ipaddress.ip_address(dst_addr)
         except ValueError:
             try:
-                dst_addr = str(ipaddress.ip_network(dst, strict=False).network_address)
+                dst_addr = ipaddress.ip_network(dst, strict=False).network_address
             except ValueError:
                 print("node name or ip address not valid.")
                 sys.exit(1)
+        is_ipv4 = isinstance(dst_addr, ipaddress.IPv4Address)
+        # lpm lookups only do integer mask arithmetic on the destination
+        dst_int = int(dst_addr)
 
         adj_dbs = client.getDecisionAdjacencyDbs()
         if2node = self.get_if2node_map(adj_dbs)
-        fib_routes = defaultdict(list)
-
-        paths = []
-
-        def _backtracking(cur, path, hop, visited, in_fib):
-            if hop > max_hop:
-                return
-
-            cur_lpm_len = self.get_lpm_len_from_node(cur, dst_addr)
-            next_hop_nodes = self.get_nexthop_nodes(
-                client.getRouteDbComputed(cur),
-                dst_addr,
+        # node -> {(nexthop addr, ifName)} of its fib route towards dst. a node
+        # is only present once its fib route was fetched, even if it was empty
+        fib_routes: Dict[str, Set[Tuple[str, str]]] = {}
+        # dst_addr is fixed for this call, so lpm len only depends on the node
+        lpm_len_cache: Dict[str, int] = {}
+        # route dbs don't change while we walk, fetch each node's only once
+        route_db_cache: Dict[str, Any] = {}
+
+        def _get_next_hop_nodes(cur, in_fib):
+            if cur not in lpm_len_cache:
+                lpm_len_cache[cur] = self.get_lpm_len_from_node(
+                    cur, dst_int, is_ipv4
+                )
+            cur_lpm_len = lpm_len_cache[cur]
+            if cur not in route_db_cache:
+                route_db = client.getRouteDbComputed(cur)
+                route_db_cache[cur] = (route_db, self.get_lpm_table(route_db))
+            route_db, lpm_table = route_db_cache[cur]
+            return self.get_nexthop_nodes(
+                route_db,
+                lpm_table,
+                dst_int,
+                is_ipv4,
                 cur_lpm_len,
                 if2node,
                 fib_routes,
                 in_fib,
             )
 
+        paths = []
+        if max_hop < 1:
+            return paths
+
+        path = []
+        visited = {src}
+        # dfs frames of (node, hop, in_fib, iterator over the node's next hops)
+        stack = []
+
+        def _visit(cur, hop, in_fib):
+            """ push a frame for cur, return False if the walk ends at cur """
+
+            next_hop_nodes = _get_next_hop_nodes(cur, in_fib)
             if len(next_hop_nodes) == 0:
                 if hop != 1:
                     paths.append((in_fib, path[:]))
-                return
-
-            for next_hop_node in next_hop_nodes:
-                next_hop_node_name = next_hop_node[0]
-                # prevent loops
-                if next_hop_node_name in visited:
-                    return
-
-                path.append([hop] + next_hop_node)
-                visited.add(next_hop_node_name)
-
-                # check if next hop node is in fib path
-                is_nexthop_in_fib_path = False
-                for nexthop in fib_routes[cur]:
-                    if (
-                        next_hop_node[3] == ipnetwork.sprint_addr(nexthop.addr)
-                        and next_hop_node[1] == nexthop.ifName
-                    ):
-                        is_nexthop_in_fib_path = True
-
-                _backtracking(
-                    next_hop_node_name,
-                    path,
-                    hop + 1,
-                    visited,
-                    is_nexthop_in_fib_path and in_fib,
-                )
+                return False
+
+            # next hops would exceed max_hop, don't pay for their route dbs
+            if hop + 1 > max_hop:
+                return False
+
+            stack.append((cur, hop, in_fib, iter(next_hop_nodes)))
+            return True
+
+        _visit(src, 1, True)
+        while stack:
+            cur, hop, in_fib, next_hop_iter = stack[-1]
+            next_hop_node = next(next_hop_iter, None)
+            if next_hop_node is None:
+                # all next hops of cur are explored, backtrack to its parent
+                stack.pop()
+                if stack:
+                    visited.remove(cur)
+                    path.pop()
+                continue
+
+            next_hop_node_name = next_hop_node[0]
+            # prevent loops
+            if next_hop_node_name in visited:
+                continue
+
+            path.append([hop] + next_hop_node)
+            visited.add(next_hop_node_name)
+
+            # check if next hop node is in fib path
+            nexthop_key = (next_hop_node[3], next_hop_node[1])
+            is_nexthop_in_fib_path = nexthop_key in fib_routes.get(cur, ())
+
+            if not _visit(
+                next_hop_node_name, hop + 1, is_nexthop_in_fib_path and in_fib
+            ):
                 visited.remove(next_hop_node_name)
                 path.pop()
 
-        _backtracking(src, [], 1, set(src), True)
         return paths
 
     def print_paths(self, paths):
@@ -389,10 +561,17 @@ class DecisionValidateCmd(DecisionCmdBase):
         kvstore_adj_node_names = set()
         kvstore_prefix_node_names = set()
 
-        for key, value in sorted(kvstore_keyvals.items()):
-            if key.startswith(Consts.ADJ_DB_MARKER) or key.startswith(
-                Consts.PREFIX_DB_MARKER
-            ):
+        # only adj and prefix dbs are validated, bucket them before sorting
+        adj_keyvals = []
+        prefix_keyvals = []
+        for key, value in kvstore_keyvals.items():
+            if key.startswith(Consts.ADJ_DB_MARKER):
+                adj_keyvals.append((key, value))
+            elif key.startswith(Consts.PREFIX_DB_MARKER):
+                prefix_keyvals.append((key, value))
+
+        for keyvals in (adj_keyvals, prefix_keyvals):
+            for key, value in sorted(keyvals):
                 return_code = self.print_db_delta(
                     key,
                     value,
@@ -8,10 +8,19 @@
 #
 
 
+import contextlib
+import copy
+import io
+import ipaddress
 import time
 import unittest
 
-from openr.cli.utils.utils import find_adj_list_deltas
+from openr.cli.utils.utils import (
+    filter_routes_dict,
+    find_adj_list_deltas,
+    print_routes_json,
+    print_routes_json_iter,
+)
 from openr.Lsdb import ttypes as lsdb_types
 
 
@@ -63,3 +72,65 @@ class UtilsTests(unittest.TestCase):
         self.assertEqual(("NEIGHBOR_DOWN", adjs_old[3], None), d2)
         self.assertEqual(("NEIGHBOR_UP", None, adjs_new[2]), d3)
         self.assertEqual(("NEIGHBOR_UPDATE", adjs_old[2], adjs_new[1]), d4)
+
+    @staticmethod
+    def create_routes_dict(num_routes):  # : int -> Dict[str, Any]
+        return {
+            "unicastRoutes": [
+                {"dest": "fc00:{}::/64".format(i), "nextHops": []}
+                for i in range(num_routes)
+            ],
+            "mplsRoutes": [
+                {"topLabel": 100 + i, "nextHops": []} for i in range(num_routes)
+            ],
+        }
+
+    def test_filter_routes_dict(self):
+        routes = self.create_routes_dict(3)
+        filter_routes_dict(routes, None, None)
+        self.assertEqual(self.create_routes_dict(3), routes)
+
+        routes = self.create_routes_dict(3)
+        filter_routes_dict(routes, [ipaddress.ip_network("fc00:1::/64")], None)
+        self.assertEqual(["fc00:1::/64"], [r["dest"] for r in routes["unicastRoutes"]])
+        self.assertEqual([], routes["mplsRoutes"])
+
+        routes = self.create_routes_dict(3)
+        filter_routes_dict(routes, None, [100, 102])
+        self.assertEqual([], routes["unicastRoutes"])
+        self.assertEqual([100, 102], [r["topLabel"] for r in routes["mplsRoutes"]])
+
+    def test_print_routes_json_iter(self):
+        filters = [
+            (None, None),
+            (["fc00:1::/64"], None),
+            (None, [101]),
+            (["fc00:0::/64"], [102]),
+        ]
+        for num_nodes in (0, 1, 3):
+            route_db_dict = {
+                "node{}".format(i): self.create_routes_dict(i + 2)
+                for i in range(num_nodes)
+            }
+            for prefixes, labels in filters:
+                expected = io.StringIO()
+                with contextlib.redirect_stdout(expected):
+                    print_routes_json(copy.deepcopy(route_db_dict), prefixes, labels)
+
+                streamed = io.StringIO()
+                with contextlib.redirect_stdout(streamed):
+                    print_routes_json_iter(
+                        sorted(copy.deepcopy(route_db_dict).items()), prefixes, labels
+                    )
+                self.assertEqual(expected.getvalue(), streamed.getvalue())
+
+    def test_print_routes_json_iter_error(self):
+        def _route_db_dicts():
+            yield ("node0", self.create_routes_dict(2))
+            raise RuntimeError("getRouteDbComputed failed")
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            with self.assertRaises(RuntimeError):
+                print_routes_json_iter(_route_db_dicts())
+        self.assertEqual("", out.getvalue())
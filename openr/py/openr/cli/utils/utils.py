@@ -12,11 +12,13 @@ import copy
 import datetime
 import ipaddress
 import json
+import shutil
 import sys
+import tempfile
 from builtins import chr, input, map
 from collections import defaultdict
 from itertools import product
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import bunch
 import click
@@ -722,6 +724,35 @@ def route_db_to_dict(route_db: fib_types.RouteDatabase) -> Dict[str, Any]:
     return ret
 
 
+def filter_routes_dict(
+    routes: Dict[str, Any],
+    networks: Optional[List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]],
+    labels: List[int] = None,
+) -> None:
+    """
+    Filter, in place, the routes of a route_db_to_dict result down to the
+    given networks and labels
+    """
+
+    filtered_unicast_routes = []
+    for route in routes["unicastRoutes"]:
+        if labels or networks:
+            if networks and ipnetwork.contain_any_prefix(route["dest"], networks):
+                filtered_unicast_routes.append(route)
+        else:
+            filtered_unicast_routes.append(route)
+    routes["unicastRoutes"] = filtered_unicast_routes
+
+    filtered_mpls_routes = []
+    for route in routes["mplsRoutes"]:
+        if labels or networks:
+            if labels and int(route["topLabel"]) in labels:
+                filtered_mpls_routes.append(route)
+        else:
+            filtered_mpls_routes.append(route)
+    routes["mplsRoutes"] = filtered_mpls_routes
+
+
 def print_routes_json(
     route_db_dict, prefixes: List[str] = None, labels: List[int] = None
 ):
@@ -736,27 +767,40 @@ def print_routes_json(
 
     # Filter out all routes based on prefixes and labels
     for routes in route_db_dict.values():
-        filtered_unicast_routes = []
-        for route in routes["unicastRoutes"]:
-            if labels or networks:
-                if networks and ipnetwork.contain_any_prefix(route["dest"], networks):
-                    filtered_unicast_routes.append(route)
-            else:
-                filtered_unicast_routes.append(route)
-        routes["unicastRoutes"] = filtered_unicast_routes
+        filter_routes_dict(routes, networks, labels)
 
-        filtered_mpls_routes = []
-        for route in routes["mplsRoutes"]:
-            if labels or prefixes:
-                if labels and int(route["topLabel"]) in labels:
-                    filtered_mpls_routes.append(route)
-            else:
-                filtered_mpls_routes.append(route)
-        routes["mplsRoutes"] = filtered_mpls_routes
+    print(json_dumps(route_db_dict))
 
-    # Filter
 
-    print(json_dumps(route_db_dict))
+def print_routes_json_iter(
+    route_db_dicts: Iterable[Tuple[str, Dict[str, Any]]],
+    prefixes: List[str] = None,
+    labels: List[int] = None,
+) -> None:
+    """
+    Print the same json as print_routes_json, but one node at a time, so
+    that only a single node's routes are held in memory. The json is spooled
+    to a temporary file and only copied to stdout once every node has been
+    encoded, so an error while iterating route_db_dicts prints nothing.
+
+    :param route_db_dicts: (node, route_db_to_dict result) sorted by node
+    """
+
+    networks = None
+    if prefixes:
+        networks = [ipaddress.ip_network(p) for p in prefixes]
+
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as spool:
+        separator = "{\n"
+        for node, routes in route_db_dicts:
+            filter_routes_dict(routes, networks, labels)
+            # strip the enclosing braces, every node is an entry of one object
+            spool.write(separator + json_dumps({node: routes})[2:-2])
+            separator = ",\n"
+        spool.write("{}\n" if separator == "{\n" else "\n}\n")
+
+        spool.seek(0)
+        shutil.copyfileobj(spool, sys.stdout)
 
 
 def print_route_db(
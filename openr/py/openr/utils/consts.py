@@ -25,6 +25,8 @@ class Consts(object):
     STATIC_PREFIX_ALLOC_PARAM_KEY = "e2e-network-allocations"
 
     CTRL_PORT = 2018
+    # max number of OpenrCtrl requests issued concurrently by a single cmd
+    CTRL_MAX_CONCURRENT_REQUESTS = 16
     KVSTORE_REP_PORT = 60002
     KVSTORE_PUB_PORT = 60001
     DECISION_REP_PORT = 60004
@@ -39,3 +39,22 @@ def deserialize_thrift_object(
     resp = thrift_type()
     Serializer.deserialize(proto_factory(), raw_data, resp)
     return resp
+
+
+def deserialize_thrift_objects(
+    raw_datas, thrift_type, proto_factory=Consts.PROTO_FACTORY
+):
+    """ Deserialize a sequence of binary blobs of the same thrift type
+
+        :param raw_datas: iterable of serialized thrift payloads
+        :param thrift_type: the thrift type
+        :param proto_factory: protocol factory, set default as Compact Protocol
+
+        :return: generator of thrift_type instances, in the order of raw_datas
+    """
+
+    factory = proto_factory()
+    for raw_data in raw_datas:
+        resp = thrift_type()
+        Serializer.deserialize(factory, raw_data, resp)
+        yield resp
@@ -60,3 +60,17 @@ class TestSerialization(unittest.TestCase):
             serializer.deserialize_thrift_object(
                 raw_msg, lsdb_types.PrefixDatabase, TJSONProtocolFactory
             )
+
+    def test_bulk_deserialization(self):
+        thrift_objs = []
+        for _ in range(10):
+            thrift_obj = lsdb_types.PrefixDatabase()
+            random_string = "".join(random.choice(string.digits) for _ in range(10))
+            thrift_obj.thisNodeName = random_string
+            thrift_objs.append(thrift_obj)
+
+        raw_msgs = (serializer.serialize_thrift_object(obj) for obj in thrift_objs)
+        recovered_objs = list(
+            serializer.deserialize_thrift_objects(raw_msgs, lsdb_types.PrefixDatabase)
+        )
+        self.assertEqual(thrift_objs, recovered_objs)